@@ -6,6 +6,7 @@ from dataclasses import dataclass, field
 from typing import *
 import z3.z3 as z3
 import time
+from collections import deque
 
 # Utility to get time for executing a block and print it later
 class Timing():
@@ -35,106 +36,151 @@ Transformation that does
 """
 def mktransform(x, y, theta, scale):
     theta = theta * pi / 180
-    return np.matrix([
+    return np.array([
         [scale * cos(theta), -scale * sin(theta), x],
         [scale * sin(theta),  scale * cos(theta), y],
         [0, 0, 1],
-    ])
+    ], dtype=np.float64)
 
-def index_opp(i):
-    return [3, 4, 1, 2][i - 1]
-def index_nei(i):
-    return [2, 3, 2, 3][i - 1]
+# Rhomb geometry: thick tiles have angles 72/108, thin tiles 36/144
+_C54, _S54 = cos(54 * pi / 180), sin(54 * pi / 180)
+_C72, _S72 = cos(72 * pi / 180), sin(72 * pi / 180)
+# Ratio of child to parent edge length in the subdivision
+_SUBSCALE = 1 / (2 * _S54)
 
-float3: TypeAlias = tuple[float, float, float]
+_OPP = (3, 4, 1, 2)
+_NEI = (2, 3, 2, 3)
+_DARKENING = (0.1, 0.4, 0.7, 1.0)
 
-def cross_product(a, b) -> float3:
-    return (a[1]*b[2] - a[2]*b[1], a[2]*b[0] - a[0]*b[2], a[0]*b[1] - a[1]*b[0])
+def index_opp(i):
+    return _OPP[i - 1]
+def index_nei(i):
+    return _NEI[i - 1]
 
-def norm(xyz: float3) -> float:
-    x, y, z = xyz
-    return (x * x + y * y + z * z) ** 0.5
+"""
+Local coordinates of the tile corners as columns, in the order returned by
+Tile.get_points():
+- thick: bottom, right, top, left (c = cos(54), s = sin(54))
+- thin: right, top, left, bottom (c = cos(72), s = sin(72))
+"""
+def _local_corners(thick: bool) -> np.ndarray:
+    if thick:
+        c, s = _C54, _S54
+        return np.array([[0, c, 0, -c], [0, s, 2 * s, s], [1, 1, 1, 1]])
+    else:
+        c, s = _C72, _S72
+        return np.array([[0, -c, -2 * c, -c], [0, s, 0, -s], [1, 1, 1, 1]])
 
-def normalize(xyz) -> float3:
-    x, y, z = xyz
-    n = norm(xyz)
-    return (x / n, y / n, z / n)
+THICK_LOCAL = _local_corners(True)
+THIN_LOCAL = _local_corners(False)
 
-@dataclass
+"""
+Subdivision rules (see notes.txt), as constant tables:
+- the (k,3,3) stack of child transforms relative to the parent,
+- whether each child is thick, shape (k,),
+- the index of each child for each parent index 1..4, shape (4,k).
+"""
+def _subdivision(thick: bool):
+    subscale = _SUBSCALE
+    if thick:
+        c, s = _C54, _S54
+        midx, midy = 0, 2 * s - subscale
+        transforms = np.stack([
+            mktransform(midx, midy, 180, subscale),
+            mktransform(0, 2*s, 180-36, subscale),
+            mktransform(0, 2*s, 180+36, subscale),
+            mktransform(-c, s, 90+36, subscale),
+            mktransform(c, s, 90-36, subscale),
+        ])
+        kinds = [True, True, True, False, False]
+        indices = [[index_opp(i)] * 3 + [index_nei(i)] * 2 for i in range(1, 5)]
+    else:
+        c = _C72
+        transforms = np.stack([
+            mktransform(0, 0, 18, subscale),
+            mktransform(0, 0, 180-18, subscale),
+            mktransform(-2*c, 0, 270-18, subscale),
+            mktransform(-2*c, 0, 90+18, subscale),
+        ])
+        kinds = [True, True, False, False]
+        indices = [[i] * 2 + [index_opp(i)] * 2 for i in range(1, 5)]
+    return transforms, np.array(kinds), np.array(indices)
+
+THICK_SUB, THICK_SUB_KINDS, THICK_SUB_INDICES = _subdivision(True)
+THIN_SUB, THIN_SUB_KINDS, THIN_SUB_INDICES = _subdivision(False)
+
+@dataclass(slots=True)
 class Tile:
     thick: bool
     index: int
-    transform: np.matrix
-    point_indices: list[int] = field(default_factory=list)
-
-    def get_point(self, lx: float, ly: float) -> tuple[float, float]:
-        u = self.transform * np.matrix([[lx], [ly], [1]])
-        return u[0].item(), u[1].item()
+    transform: np.ndarray
+    point_indices: Optional[np.ndarray] = None  # (4,) int32 row of TileArray
+    _points: Optional[list[tuple[float, float]]] = field(default=None, repr=False)
 
     def get_points(self) -> list[tuple[float, float]]:
-        return [xy for xy, z in self.get_points_with_height()]
-
-    def get_points_with_height(self) -> list[tuple[tuple[float, float], float]]:
-        if self.thick:
-            c, s = cos(54 * pi / 180), sin(54 * pi / 180)
-            bot = self.get_point(0, 0)
-            left = self.get_point(-c, s)
-            right = self.get_point(c, s)
-            top = self.get_point(0, 2 * s)
-
-            i_bot = self.index
-            i_top = index_opp(i_bot)
-            i_mid = (i_bot + i_top) / 2
-            return [(bot, self.index), (right, i_mid), (top, i_top), (left, i_mid)]
-        else:
-            c, s = cos(72 * pi / 180), sin(72 * pi / 180)
-            right = self.get_point(0, 0)
-            top = self.get_point(-c, s)
-            left = self.get_point(-2 * c, 0)
-            bottom = self.get_point(-c, -s)
-
-            i_right = self.index
-            i_left = index_opp(i_right)
-            i_mid = (i_right + i_left) / 2
-            return [(right, i_right), (top, i_mid), (left, i_left), (bottom, i_mid)]
-
-    def normal(self) -> tuple[float, float, float]:
-        p1, p2, p3, p4 = self.get_points_with_height()
-        p1 = (p1[0][0], p1[0][1], p1[1])
-        p2 = (p2[0][0], p2[0][1], p2[1])
-        p3 = (p3[0][0], p3[0][1], p3[1])
-        p4 = (p4[0][0], p4[0][1], p4[1])
-        d1 = (p3[0] - p1[0], p3[1] - p1[1], p3[2] - p1[2])
-        d2 = (p4[0] - p2[0], p4[1] - p2[1], p4[2] - p2[2])
-        return normalize(cross_product(d1, d2))
-
-    def center(self) -> tuple[float, float]:
-        p1, _, p2, _ = self.get_points()
-        return (p1[0] + p2[0]) / 2, (p1[1] + p2[1]) / 2
-
-    def subdivide(self) -> list["Tile"]:
-        s = sin(54 * pi / 180)
-        subscale = 1 / (2 * s)
-        ind = self.index
-        opp = index_opp(self.index)
-        nei = index_nei(self.index)
-
-        if self.thick:
-            c = cos(54 * pi / 180)
-            midx, midy = 0, 2 * s - 1 / (2 * s)
-            T1 = Tile(True, opp, self.transform * mktransform(midx, midy, 180, subscale))
-            T2 = Tile(True, opp, self.transform * mktransform(0, 2*s, 180-36, subscale))
-            T3 = Tile(True, opp, self.transform * mktransform(0, 2*s, 180+36, subscale))
-            t1 = Tile(False, nei, self.transform * mktransform(-c, s, 90+36, subscale))
-            t2 = Tile(False, nei, self.transform * mktransform(c, s, 90-36, subscale))
-            return [T1, T2, T3, t1, t2]
-        else:
-            c, s = cos(72 * pi / 180), sin(72 * pi / 180)
-            T1 = Tile(True, ind, self.transform * mktransform(0, 0, 18, subscale))
-            T2 = Tile(True, ind, self.transform * mktransform(0, 0, 180-18, subscale))
-            t1 = Tile(False, opp, self.transform * mktransform(-2*c, 0, 270-18, subscale))
-            t2 = Tile(False, opp, self.transform * mktransform(-2*c, 0, 90+18, subscale))
-            return [T1, T2, t1, t2]
+        # Corners only depend on the transform, so compute them once. Heights
+        # are not cached since the index is reassigned after solving.
+        if self._points is None:
+            local = THICK_LOCAL if self.thick else THIN_LOCAL
+            M = self.transform @ local
+            self._points = [(x, y) for x, y in M[:2].T.tolist()]
+        return self._points
+
+"""
+Struct-of-arrays representation of a list of tiles, used for subdivision so
+that the whole population is transformed at once.
+"""
+@dataclass
+class TileArray:
+    transforms: np.ndarray  # (N,3,3)
+    thick: np.ndarray       # (N,) bool
+    index: np.ndarray       # (N,) int
+    # Indices of the corners in the point list, once deduplicated
+    point_indices: Optional[np.ndarray] = None  # (N,4) int32
+
+    def __len__(self) -> int:
+        return len(self.thick)
+
+    def __getitem__(self, sel) -> "TileArray":
+        return TileArray(
+            self.transforms[sel], self.thick[sel], self.index[sel],
+            None if self.point_indices is None else self.point_indices[sel])
+
+    # If the (N,4,2) corners are already known, they seed each Tile's cache
+    def to_tiles(self, points: Optional[np.ndarray] = None) -> list[Tile]:
+        point_indices = self.point_indices
+        if point_indices is None:
+            point_indices = [None] * len(self)
+        tiles = [Tile(bool(k), int(i), M, pi) for M, k, i, pi
+                 in zip(self.transforms, self.thick, self.index, point_indices)]
+        if points is not None:
+            for tile, ps in zip(tiles, points.tolist()):
+                tile._points = [(x, y) for x, y in ps]
+        return tiles
+
+    # Corners of all tiles as an (N,4,2) array, in the same order as
+    # Tile.get_points()
+    def points(self) -> np.ndarray:
+        P = np.empty((len(self), 4, 2))
+        for thick, local in ((True, THICK_LOCAL), (False, THIN_LOCAL)):
+            sel = self.thick == thick
+            P[sel] = (self.transforms[sel] @ local)[:, :2].transpose(0, 2, 1)
+        return P
+
+    # Corners of all tiles as an (N,4,3) array of (x, y, height), with heights
+    # index, mid, opposite, mid. The (N,4,2) corners are reused if known.
+    def points_with_height(self, points: Optional[np.ndarray] = None) -> np.ndarray:
+        P = np.empty((len(self), 4, 3))
+        P[:, :, :2] = self.points() if points is None else points
+        i_opp = np.array(_OPP)[self.index - 1]
+        i_mid = (self.index + i_opp) / 2
+        P[:, :, 2] = np.stack([self.index, i_mid, i_opp, i_mid], axis=1)
+        return P
+
+# Unit normals of tiles from their (N,4,3) corners, as an (N,3) array
+def tile_normals(P: np.ndarray) -> np.ndarray:
+    n = np.cross(P[:, 2] - P[:, 0], P[:, 3] - P[:, 1])
+    return n / np.linalg.norm(n, axis=1, keepdims=True)
 
 def mkcolor(hex: int):
     r, g, b = (hex >> 16) & 0xff, (hex >> 8) & 0xff, (hex & 0xff)
@@ -142,43 +188,70 @@ def mkcolor(hex: int):
 
 def mkcolor_darkened(hex: int, index: int):
     r, g, b = mkcolor(hex)
-    darkening_amount = [0.1, 0.4, 0.7, 1.0][index - 1]
+    darkening_amount = _DARKENING[index - 1]
     da = darkening_amount
     return r * da, g * da, b * da
 
 def set_color(ctx: cairo.Context, hex: int):
     ctx.set_source_rgb(*mkcolor(hex))
 
-def draw_tile(ctx: cairo.Context, t: Tile, color: int | None = None):
-    ps = t.get_points()
-    ctx.move_to(*ps[0])
-    for xy in ps[1:]:
-        ctx.line_to(*xy)
+def tile_path(ctx: cairo.Context, ps: list[tuple[float, float]]):
+    (x0, y0), (x1, y1), (x2, y2), (x3, y3) = ps
+    ctx.move_to(x0, y0)
+    ctx.line_to(x1, y1)
+    ctx.line_to(x2, y2)
+    ctx.line_to(x3, y3)
     ctx.close_path()
 
+"""
+Gradient of a tile from its first corner (index) to its third (opposite
+index), defined from (0,0) to (1,0) so it can be shared by all tiles of the
+same kind and index and aimed at each one with aim_gradient().
+"""
+def tile_gradient(thick: bool, index: int) -> cairo.LinearGradient:
+    color = 0x62ae19 if thick else 0x80afe1
+    gradient = cairo.LinearGradient(0, 0, 1, 0)
+    gradient.add_color_stop_rgb(0, *mkcolor_darkened(color, index))
+    gradient.add_color_stop_rgb(1, *mkcolor_darkened(color, index_opp(index)))
+    return gradient
+
+# Set the pattern matrix so that start maps to (0,0) and end to (1,0)
+def aim_gradient(gradient: cairo.LinearGradient, start, end):
+    (sx, sy), (ex, ey) = start, end
+    dx, dy = ex - sx, ey - sy
+    l2 = dx * dx + dy * dy
+    gradient.set_matrix(cairo.Matrix(
+        dx / l2, -dy / l2, dy / l2, dx / l2,
+        -(sx * dx + sy * dy) / l2, (sx * dy - sy * dx) / l2))
+
+"""
+Draw tiles with batched Cairo state changes: fills are grouped by gradient
+(or done in one go with a solid color), then all outlines are stroked at once.
+"""
+def draw_tiles(ctx: cairo.Context, tiles: list[Tile], color: int | None = None):
     if color is not None:
+        for t in tiles:
+            tile_path(ctx, t.get_points())
         set_color(ctx, color)
-    elif t.thick:
-        start, _, end, _ = t.get_points()
-        gradient = cairo.LinearGradient(*start, *end)
-        gradient.add_color_stop_rgb(0, *mkcolor_darkened(0x62ae19, t.index))
-        gradient.add_color_stop_rgb(1, *mkcolor_darkened(0x62ae19, index_opp(t.index)))
-        ctx.set_source(gradient)
+        ctx.fill()
     else:
-        color = 0x80afe1
-        # color = 0x62ae19
-        start, _, end, _ = t.get_points()
-        gradient = cairo.LinearGradient(*start, *end)
-        gradient.add_color_stop_rgb(0, *mkcolor_darkened(color, t.index))
-        gradient.add_color_stop_rgb(1, *mkcolor_darkened(color, index_opp(t.index)))
-        ctx.set_source(gradient)
-
-    ctx.fill_preserve()
+        groups: dict[tuple[bool, int], list[Tile]] = {}
+        for t in tiles:
+            groups.setdefault((t.thick, t.index), []).append(t)
+        for (thick, index), group in groups.items():
+            gradient = tile_gradient(thick, index)
+            ctx.set_source(gradient)
+            for t in group:
+                ps = t.get_points()
+                tile_path(ctx, ps)
+                aim_gradient(gradient, ps[0], ps[2])
+                ctx.fill()
 
+    for t in tiles:
+        tile_path(ctx, t.get_points())
     ctx.set_line_join(cairo.LINE_JOIN_ROUND)
     ctx.set_line_width(4.0)
     ctx.set_source_rgb(0, 0, 0)
-
     ctx.stroke()
 
 def draw_text(ctx: cairo.Context, x: float, y: float, align: str, text: str) -> None:
@@ -204,67 +277,178 @@ def draw_text(ctx: cairo.Context, x: float, y: float, align: str, text: str) ->
     ctx.set_line_width(2.0)
     ctx.stroke()
 
-def subdivide_set(tiles: list[Tile]) -> list[Tile]:
-    new_tiles = []
-    for t in tiles:
-        new_tiles.extend(t.subdivide())
-    return new_tiles
-
-def main():
-    w, h = 1080, 1080
-    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, w, h)
-    ctx = cairo.Context(surface)
-    ctx.translate(w / 2, h / 2)
-    ctx.scale(1, 1)
-
-    tiles = [Tile(True, 1, mktransform(0, -400, 0, 430))]
-    steps = 5
+# Points closer than this (in L1 distance) are considered identical
+EPSILON = 0.0001
 
-    with Timing() as t:
-        for i in range(steps):
-            tiles = subdivide_set(tiles)
-    print(f"subdivide: {t}")
+# Pack (N,2) integer grid cells into single int64 keys
+def cell_keys(cells: np.ndarray) -> np.ndarray:
+    return (cells[:, 0] << 32) | (cells[:, 1] & 0xffffffff)
 
-    # Easiest path forward:
-    # -> Construct adjacency graph by looking at point coordinates (approximately)
-    # -> Solve for indices in a graph traversal manner
+"""
+Approximate deduplication of an (N,2) array of points. Returns the distinct
+points and, for each input point, its index among them (in order of first
+occurrence).
+
+Two points are the same when they are closer than EPSILON in L1 distance,
+and this is applied transitively: each group of chained close points maps to
+its first occurrence. Points are sorted by packed 64-bit keys of their
+EPSILON-sized grid cell, and every point is tested against every point in
+the 3×3 cells around its own, like a spatial hash lookup would.
+"""
+def dedup_points(xy: np.ndarray) -> tuple[list[tuple[float, float]], np.ndarray]:
+    # Exact duplicates (shared corners) are collapsed first, so only distinct
+    # coordinates go through the neighbourhood test
+    _, first, inverse = np.unique(xy[:, 0] + 1j * xy[:, 1],
+                                  return_index=True, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    pts = xy[first]
+    cells = np.floor(pts / EPSILON).astype(np.int64)
+    order = np.argsort(cell_keys(cells), kind="stable")
+    keys = cell_keys(cells)[order]
+
+    # Close pairs (a, b) of distinct points, from each point to the points of
+    # each neighbouring cell (found as a range of the sorted keys)
+    pairs_a, pairs_b = [], []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            nkeys = cell_keys(cells + (dx, dy))
+            lo = np.searchsorted(keys, nkeys, side="left")
+            hi = np.searchsorted(keys, nkeys, side="right")
+            counts = hi - lo
+            a = np.repeat(np.arange(len(pts)), counts)
+            b = order[np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts - lo, counts)]
+            close = (a != b) & (np.abs(pts[a] - pts[b]).sum(axis=1) < EPSILON)
+            pairs_a.append(a[close])
+            pairs_b.append(b[close])
+    a, b = np.concatenate(pairs_a), np.concatenate(pairs_b)
+
+    # Label every distinct point with the earliest input index in its group
+    label = first.copy()
+    while True:
+        new = label.copy()
+        np.minimum.at(new, a, label[b])
+        if np.array_equal(new, label):
+            break
+        label = new
+
+    # Number the groups in order of first occurrence
+    groups, group_of = np.unique(label, return_inverse=True)
+    coords = [(x, y) for x, y in xy[groups].tolist()]
+    return coords, group_of.reshape(-1).astype(np.int32)[inverse]
+
+def subdivide_set(tiles: TileArray) -> TileArray:
+    # Children of thick tiles go first, then those of thin tiles
+    rules = [(tiles.thick, THICK_SUB, THICK_SUB_KINDS, THICK_SUB_INDICES),
+             (~tiles.thick, THIN_SUB, THIN_SUB_KINDS, THIN_SUB_INDICES)]
+    counts = [int(np.count_nonzero(sel)) for sel, *_ in rules]
+
+    # Allocate the output once and write each group into its slice
+    size = sum(n * len(sub) for n, (_, sub, *_) in zip(counts, rules))
+    result = TileArray(np.empty((size, 3, 3)),
+                       np.empty(size, dtype=bool),
+                       np.empty(size, dtype=tiles.index.dtype))
+
+    start = 0
+    for n, (sel, sub, kinds, indices) in zip(counts, rules):
+        k = len(sub)
+        end = start + n * k
+        # (n,1,3,3) @ (k,3,3) -> (n,k,3,3), children of each parent kept together
+        np.matmul(tiles.transforms[sel][:, None], sub,
+                  out=result.transforms[start:end].reshape(n, k, 3, 3))
+        result.thick[start:end].reshape(n, k)[:] = kinds
+        result.index[start:end].reshape(n, k)[:] = indices[tiles.index[sel] - 1]
+        start = end
+    return result
 
-    points: list[tuple[tuple[float, float], list[Tile]]] = []
+"""
+Heights of a tile's corners, as (mid1, mid2, end1, end2) point indices. Each
+rhomb has two opposite corners at the same height m and two other corners at
+m+d and m-d, with d = ±1:
+- thick (bot, right, top, left): right = left, top and bot at right ± 1
+- thin (right, top, left, bot): top = bot, left and right at top ± 1
+"""
+def height_roles(tile: Tile) -> tuple[int, int, int, int]:
+    # Both kinds list corners in the same roles: end, mid, end, mid
+    p1, p2, p3, p4 = tile.point_indices
+    return p2, p4, p3, p1
 
-    def closest_point(target_x: float, target_y: float, points: Iterable[tuple[float, float]]) -> Optional[int]:
-        EPSILON = 0.0001
-        for i, (x, y) in enumerate(points):
-            if abs(x - target_x) + abs(y - target_y) < EPSILON:
-                return i
+"""
+Assign the heights of a tile's corners from the ones already known in h.
+Returns None if there isn't enough information yet, False if the known
+heights contradict each other, True once all four corners are assigned.
+"""
+def propagate_tile(roles: tuple[int, int, int, int], h: list[Optional[int]]) -> Optional[bool]:
+    m1, m2, e1, e2 = roles
+    m = h[m1] if h[m1] is not None else h[m2]
+    if m is None and h[e1] is not None and h[e2] is not None:
+        if (h[e1] + h[e2]) % 2:
+            return False
+        m = (h[e1] + h[e2]) // 2
+    if m is None:
         return None
+    if h[e1] is not None:
+        d = h[e1] - m
+    elif h[e2] is not None:
+        d = m - h[e2]
+    else:
+        return None
+    if d not in (-1, 1):
+        return False
 
-    # Filter tiles for uniqueness
-    unique_tiles: list[Tile] = []
-    unique_tile_centers: list[tuple[float, float]] = []
+    for p, value in zip(roles, (m, m, m + d, m - d)):
+        if h[p] is None:
+            h[p] = value
+        elif h[p] != value:
+            return False
+    return True
 
-    print(f"{len(tiles)} tiles")
-
-    with Timing() as t:
-        for tile in tiles:
-            x, y = tile.center()
-            i = closest_point(x, y, unique_tile_centers)
-            if i is None:
-                unique_tiles.append(tile)
-                unique_tile_centers.append((x, y))
-
-        tiles = unique_tiles
-
-        for tile in tiles:
-            tile.point_indices = []
-            for (x, y) in tile.get_points():
-                i = closest_point(x, y, (p[0] for p in points))
-                if i is None:
-                    points.append(((x, y), []))
-                    i = len(points) - 1
-                points[i][1].append(tile)
-                tile.point_indices.append(i)
-    print(f"uniq: {t}")
+"""
+Solve for point heights by propagation. Each edge joins a mid corner to an end
+corner, so once the heights of one edge are known the whole tile is forced;
+starting from one seed tile, heights spread over the tiling through shared
+edges in linear time. Heights are then shifted into the range 1..4. Returns
+None if the tiling is not covered or is inconsistent.
+"""
+def solve_heights(tiles: list[Tile], n_points: int) -> Optional[list[int]]:
+    if not tiles:
+        return []
+    roles = [height_roles(tile) for tile in tiles]
+    point_tiles: list[list[int]] = [[] for _ in range(n_points)]
+    for k, tile in enumerate(tiles):
+        for p in tile.point_indices:
+            point_tiles[p].append(k)
+
+    # Seed with the index the first tile got from subdivision
+    h: list[Optional[int]] = [None] * n_points
+    m1, m2, e1, e2 = roles[0]
+    h[e2], h[e1] = tiles[0].index, index_opp(tiles[0].index)
+    h[m1] = h[m2] = (h[e1] + h[e2]) // 2
+
+    done = [False] * len(tiles)
+    queue = deque([0])
+    while queue:
+        k = queue.popleft()
+        if done[k]:
+            continue
+        result = propagate_tile(roles[k], h)
+        if result is False:
+            return None
+        if result:
+            done[k] = True
+            for p in roles[k]:
+                queue.extend(j for j in point_tiles[p] if not done[j])
+
+    if not all(done):
+        return None
+    low = min(h)
+    if max(h) - low > 3:
+        return None
+    return [z - low + 1 for z in h]
 
+"""
+Solve for point heights with Z3, as a fallback for solve_heights().
+"""
+def solve_heights_z3(tiles: list[Tile], n_points: int) -> Optional[list[int]]:
     # For each i, points[i], make a height variable h_i
     # For each thick rhombus T with points (bot, right, top, left), constraint:
     #   h_right = h_left /\
@@ -275,10 +459,10 @@ def main():
     #   ((h_right = h_top - 1 /\ h_left = h_top + 1)
     #    \/ (h_left = h_top - 1 /\ h_right = h_top + 1))
 
-    h = [z3.Int(f"h_{i}") for i in range(len(points))]
+    h = [z3.Int(f"h_{i}") for i in range(n_points)]
     s = z3.Solver()
 
-    for i in range(len(points)):
+    for i in range(n_points):
         s.add(h[i] >= 1, h[i] <= 4)
 
     for tile in tiles:
@@ -293,12 +477,64 @@ def main():
             s.add(z3.Or(z3.And(h[right] == h[top] - 1, h[left] == h[top] + 1),
                         z3.And(h[left] == h[top] - 1, h[right] == h[top] + 1)))
 
+    if s.check() != z3.sat:
+        return None
+    m = s.model()
+    return [m.eval(h[i], model_completion=True).py_value() for i in range(n_points)]
+
+def main():
+    w, h = 1080, 1080
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, w, h)
+    ctx = cairo.Context(surface)
+    ctx.translate(w / 2, h / 2)
+    ctx.scale(1, 1)
+
+    tiles = TileArray(mktransform(0, -400, 0, 430)[None], np.array([True]), np.array([1]))
+    steps = 5
+
+    with Timing() as t:
+        for i in range(steps):
+            tiles = subdivide_set(tiles)
+    print(f"subdivide: {t}")
+
+    # Easiest path forward:
+    # -> Construct adjacency graph by looking at point coordinates (approximately)
+    # -> Solve for indices in a graph traversal manner
+
+    print(f"{len(tiles)} tiles")
+
+    # Filter tiles for uniqueness (by center) and register the corners of
+    # unique tiles as points
     with Timing() as t:
-        if s.check() == z3.sat:
-            m = s.model()
+        P = tiles.points()
+        _, center_ids = dedup_points((P[:, 0] + P[:, 2]) / 2)
+        _, first = np.unique(center_ids, return_index=True)
+        unique = np.zeros(len(tiles), dtype=bool)
+        unique[first] = True
+
+        tiles, P = tiles[unique], P[unique]
+        point_coords, point_ids = dedup_points(P.reshape(-1, 2))
+        tiles.point_indices = point_ids.reshape(-1, 4)
+        unique_point_indices = tiles.point_indices.tolist()
+
+        # Points with the indices of their adjacent tiles
+        points: list[tuple[tuple[float, float], list[int]]] = [(xy, []) for xy in point_coords]
+        for k, pis in enumerate(unique_point_indices):
+            for i in pis:
+                points[i][1].append(k)
+
+        tile_array, tiles = tiles, tiles.to_tiles(P)
+    print(f"uniq: {t}")
+
+    with Timing() as t:
+        heights = solve_heights(tiles, len(points))
+        if heights is None:
+            heights = solve_heights_z3(tiles, len(points))
+        if heights is not None:
             print("sat")
             for tile in tiles:
-                tile.index = m[h[tile.point_indices[0]]].py_value()
+                tile.index = heights[tile.point_indices[0]]
+            tile_array.index = np.array(heights)[tile_array.point_indices[:, 0]]
         else:
             print("unsat")
     print(f"solve: {t}")
@@ -307,8 +543,13 @@ def main():
     ctx.set_font_size(37)
 
     with Timing() as t:
-        for tile in tiles:
-            draw_tile(ctx, tile)
+        # Skip tiles entirely outside of the canvas, whose origin is at the
+        # center, allowing for half the outline width
+        (xmin, ymin), (xmax, ymax) = P.min(axis=1).T, P.max(axis=1).T
+        margin = 2.0
+        visible = ((xmax > -w / 2 - margin) & (xmin < w / 2 + margin)
+                 & (ymax > -h / 2 - margin) & (ymin < h / 2 + margin))
+        draw_tiles(ctx, [tile for tile, v in zip(tiles, visible.tolist()) if v])
 
         if steps < 5:
             for ((x, y), adjacent_tiles) in points:
@@ -326,27 +567,27 @@ def main():
 
     surface.write_to_png("output/tiling.png")
 
+    # Build the whole file in memory and write it at once
+    P = tile_array.points_with_height(P)
+    normals = tile_normals(P)
+
+    chunks = ["module autogen(thickness) {\n"]
+    for thick, ps, (nx, ny, nz) in zip(tile_array.thick.tolist(), P.tolist(), normals.tolist()):
+        pts_str = "".join(f"      [{x}, {y}, {z}], " for x, y, z in ps)
+        pts_off_str = "".join(
+            f"      [{x}+{nx}*thickness, {y}+{ny}*thickness, {z}+{nz}*thickness], "
+            for x, y, z in ps)
+        chunks.append(
+            "union() {\n"
+            + ("  green() " if thick else "blue() ")
+            + "  hull() {\n"
+            + f"    polyhedron(points=[{pts_str}     ], faces=[[0, 1, 2, 3]]);\n"
+            + f"    polyhedron(points=[{pts_off_str}    ], faces=[[0, 1, 2, 3]]);\n"
+            + "    }\n"
+            + "  }\n")
+    chunks.append("}\n")
+
     with open("output/autogen.scad", "w") as fp:
-        fp.write("module autogen(thickness) {\n")
-        for tile in tiles:
-            nx, ny, nz = tile.normal()
-            fp.write("union() {\n")
-            fp.write("  green() " if tile.thick else "blue() ")
-            fp.write("  hull() {\n")
-
-            # fp.write("  green() " if tile.thick else "blue() ")
-            fp.write("    polyhedron(points=[")
-            for (x, y), z in tile.get_points_with_height():
-                fp.write(f"      [{x}, {y}, {z}], ")
-            fp.write("     ], faces=[[0, 1, 2, 3]]);\n")
-
-            # fp.write("  red() " if tile.thick else "orange() ")
-            fp.write("    polyhedron(points=[")
-            for (x, y), z in tile.get_points_with_height():
-                fp.write(f"      [{x}+{nx}*thickness, {y}+{ny}*thickness, {z}+{nz}*thickness], ")
-            fp.write("    ], faces=[[0, 1, 2, 3]]);\n")
-            fp.write("    }\n")
-            fp.write("  }\n")
-        fp.write("}\n")
+        fp.writelines(chunks)
 
 main()
@@ -6,29 +6,80 @@ from dataclasses import dataclass, field
 from numbers import Rational
 from fractions import Fraction
 from math import sqrt, cos, sin
+import logging
 import math
 import cairo
+import numpy as np
 
+logger = logging.getLogger(__name__)
 
-# quadratic extension field Q(sqrt(5)),
-@dataclass
+
+# Denominators are only reduced once they grow past this many bits
+_QQUAD_REDUCE_BITS = 128
+
+
+# quadratic extension field Q(sqrt(5)), as a/b + c/d√sq. Components are kept
+# as plain int numerator/denominator pairs and only reduced to lowest terms
+# on demand (comparison, printing, conversion) or when they get too large,
+# instead of on every operation like Fraction does.
+@dataclass(slots=True)
 class QQuad:
-    a: Fraction = Fraction(0)
-    b: Fraction = Fraction(0)
+    an: int = 0
+    ad: int = 1
+    bn: int = 0
+    bd: int = 1
     sq: int = 5  # square root of this number is adjoined to the rationals
+    # Value of to_float(), computed on first use (QQuads are never mutated)
+    _float: float | None = field(default=None, repr=False)
 
     # TODO: I want anything that can be coerced to a fraction.
     def __init__(self,
         a : int | float | Rational  | Fraction = Fraction(0),
         b: int | float | Rational | Fraction = Fraction(0), sq: int = 5):
-        self.a = Fraction(a)
-        self.b = Fraction(b)
+        a, b = Fraction(a), Fraction(b)
+        self.an, self.ad = a.numerator, a.denominator
+        self.bn, self.bd = b.numerator, b.denominator
         self.sq = sq
+        self._float = None
+
+    # Builds (an/ad) + (bn/bd)√sq without going through Fraction; denominators
+    # must be positive
+    @staticmethod
+    def of_ints(an: int, ad: int, bn: int, bd: int, sq: int = 5) -> "QQuad":
+        q = QQuad.__new__(QQuad)
+        q.an, q.ad, q.bn, q.bd, q.sq = an, ad, bn, bd, sq
+        q._float = None
+        if ad.bit_length() > _QQUAD_REDUCE_BITS or bd.bit_length() > _QQUAD_REDUCE_BITS:
+            q._normalize()
+        return q
+
+    def _normalize(self):
+        g = math.gcd(self.an, self.ad)
+        self.an, self.ad = self.an // g, self.ad // g
+        g = math.gcd(self.bn, self.bd)
+        self.bn, self.bd = self.bn // g, self.bd // g
+
+    @property
+    def a(self) -> Fraction:
+        return Fraction(self.an, self.ad)
+
+    @property
+    def b(self) -> Fraction:
+        return Fraction(self.bn, self.bd)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, QQuad):
+            return NotImplemented
+        self._normalize()
+        other._normalize()
+        return (self.an, self.ad, self.bn, self.bd, self.sq) == \
+            (other.an, other.ad, other.bn, other.bd, other.sq)
 
     def __str__(self) -> str:
-        if self.b == 0:
+        self._normalize()
+        if self.bn == 0:
             return f"{self.a}"
-        elif self.a == 0:
+        elif self.an == 0:
             return f"{self.b}√{self.sq}"
         else:
             return f"({self.a} + {self.b}√{self.sq})"
@@ -38,29 +89,45 @@ class QQuad:
 
     def add(self, other: "QQuad") -> "QQuad":
         assert self.compatible(other)
-        return QQuad(self.a + other.a, self.b + other.b, self.sq)
+        return QQuad.of_ints(
+            self.an * other.ad + other.an * self.ad, self.ad * other.ad,
+            self.bn * other.bd + other.bn * self.bd, self.bd * other.bd,
+            self.sq)
 
     def mul(self, other: "QQuad") -> "QQuad":
         assert self.compatible(other)
         # (a + b√sq)(a' + b'√sq) = (aa' + bb' * sq) + (ab' + ba') * √sq
-        return QQuad(
-            self.a * other.a + self.b * other.b * self.sq,
-            self.a * other.b + self.b * other.a,
-            self.sq
-        )
+        aa_n, aa_d = self.an * other.an, self.ad * other.ad
+        bb_n, bb_d = self.bn * other.bn * self.sq, self.bd * other.bd
+        ab_n, ab_d = self.an * other.bn, self.ad * other.bd
+        ba_n, ba_d = self.bn * other.an, self.bd * other.ad
+        return QQuad.of_ints(
+            aa_n * bb_d + bb_n * aa_d, aa_d * bb_d,
+            ab_n * ba_d + ba_n * ab_d, ab_d * ba_d,
+            self.sq)
 
     def neg(self) -> "QQuad":
-        return QQuad(-self.a, -self.b, self.sq)
+        return QQuad.of_ints(-self.an, self.ad, -self.bn, self.bd, self.sq)
 
     def reciprocal(self) -> "QQuad":
         # 1 / (a + b√sq) = (a - b√sq) / (a^2 - b^2*sq)
-        denom = self.a * self.a - self.b * self.b * self.sq
-        if denom == 0:
+        # With a = an/ad, b = bn/bd: a^2 - b^2*sq = n / (ad^2 * bd^2)
+        n = (self.an * self.bd)**2 - (self.bn * self.ad)**2 * self.sq
+        if n == 0:
             raise ZeroDivisionError("Cannot take reciprocal of zero")
-        return QQuad(self.a / denom, -self.b / denom, self.sq)
+        d = (self.ad * self.bd)**2
+        sign = 1 if n > 0 else -1
+        return QQuad.of_ints(
+            sign * self.an * d // self.ad, abs(n),
+            -sign * self.bn * d // self.bd, abs(n),
+            self.sq)
 
     def sub(self, other: "QQuad") -> "QQuad":
-        return self.add(other.neg())
+        assert self.compatible(other)
+        return QQuad.of_ints(
+            self.an * other.ad - other.an * self.ad, self.ad * other.ad,
+            self.bn * other.bd - other.bn * self.bd, self.bd * other.bd,
+            self.sq)
 
     def div(self, other: "QQuad") -> "QQuad":
         return self.mul(other.reciprocal())
@@ -81,29 +148,36 @@ class QQuad:
         return self.div(other)
 
     def to_float(self) -> float:
-        return self.a + self.b * sqrt(self.sq)
+        if self._float is None:
+            self._normalize()
+            self._float = self.an / self.ad + self.bn / self.bd * sqrt(self.sq)
+        return self._float
 
 
-@dataclass
+@dataclass(slots=True)
 class QPoint2D:
-    x: QQuad = field(default_factory=QQuad())
-    y: QQuad = field(default_factory=QQuad())
+    x: QQuad
+    y: QQuad
+
+    def __init__(self, x: QQuad, y: QQuad):
+        self.x = x
+        self.y = y
 
     @staticmethod
     def zero() -> "QPoint2D":
         return QPoint2D(QQuad(0), QQuad(0))
 
     def add(self, other: "QPoint2D") -> "QPoint2D":
-        return QPoint2D(self.x + other.x, self.y + other.y)
+        return QPoint2D(self.x.add(other.x), self.y.add(other.y))
 
     def neg(self) -> "QPoint2D":
-        return QPoint2D(-self.x, -self.y)
+        return QPoint2D(self.x.neg(), self.y.neg())
 
     def sub(self, other: "QPoint2D") -> "QPoint2D":
-        return self.add(other.neg())
+        return QPoint2D(self.x.sub(other.x), self.y.sub(other.y))
 
     def scale(self, scalar: QQuad) -> "QPoint2D":
-        return QPoint2D(self.x * scalar, self.y * scalar)
+        return QPoint2D(self.x.mul(scalar), self.y.mul(scalar))
 
     def __add__(self, other: "QPoint2D") -> "QPoint2D":
         return self.add(other)
@@ -122,147 +196,354 @@ class QPoint2D:
 
     def __truediv__(self, scalar: QQuad) -> "QPoint2D":
         return self.scale(scalar.reciprocal())
- 
+
     @staticmethod
     def of_angle(angle: float) -> "QPoint2D":
         return QPoint2D(QQuad(cos(angle)), QQuad(sin(angle)))
 
     def len(self) -> float:
         return sqrt(self.x.to_float()**2 + self.y.to_float()**2)
-@dataclass
-class Tri:
-    # vertices in the tri.
-    vs: tuple[QPoint2D, QPoint2D, QPoint2D]
-    # height : float
-    # color.
-    color: int
-
-    def __init__(self, vs: tuple[QPoint2D, QPoint2D, QPoint2D], color: int):
-        self.vs = vs
-        self.color = color
-
-    def A(self) -> QPoint2D:
-        return self.vs[0]
-    
-    def B(self) -> QPoint2D:
-        return self.vs[1]
-    
-    def C(self) -> QPoint2D:
-        return self.vs[2]
-
-def subdivide_tri_method_2(tri : Tri) -> list[Tri]:
-    # (1 + sqrt(5)) / 2
-    goldenRatio = QQuad(Fraction(1), Fraction(1)) / QQuad(Fraction(2))
-    if tri.color == 0:
-        # Subdivide red (sharp isosceles) (half kite) triangle
-        Q = tri.A() + (tri.B() - tri.A()) / goldenRatio
-        R = tri.B() + (tri.C() - tri.B()) / goldenRatio
-        return [Tri((R, Q, tri.B()), 1), \
-            Tri((Q, tri.A(), R), 0), \
-            Tri((tri.C(), tri.A(), R), 0)]
-    else:
-        # Subdivide blue (fat isosceles) (half dart) triangle
-        P = tri.C() + (tri.A() - tri.C()) / goldenRatio
-        return [Tri((tri.B(), P, tri.A()), 1), \
-            Tri((P, tri.C(), tri.B()), 0)]
-
-
-def subdivide_tri_method_1(tri : Tri) -> list[Tri]:
-    # (1 + sqrt(5)) / 2
-    goldenRatio = QQuad(Fraction(1), Fraction(1)) / QQuad(Fraction(2))
-    if tri.color == 0:
-        # Subdivide red
-        P = tri.A() + (tri.B() - tri.A()) / goldenRatio
-        return [ Tri((tri.C(), P, tri.B()), 0), Tri((P, tri.C(), tri.A()), 1)]
-    else:
-        # Subdivide blue
-        Q = tri.B() + (tri.A() - tri.B()) / goldenRatio
-        R = tri.B() + (tri.C() - tri.B()) / goldenRatio
-        return [Tri((R, tri.C(), tri.A()), 1), Tri((Q, R, tri.B()), 1), Tri((R, Q, tri.A()), 0)]
 
 
-def subdivide_tris_once(triangles : list[Tri]) -> list[Tri]:
-    SUBDIVIDE_METHOD = subdivide_tri_method_1
-    # 1 + sqrt(5) / 2
+# 1/φ = (√5 - 1) / 2, the ratio at which subdivision splits triangle edges.
+INV_PHI = 2.0 / (1.0 + math.sqrt(5.0))
 
-    # How go give type annotation? This is List[Tri]
-    result : list[Tri] = []
-    for tri in triangles:
-        result.extend(SUBDIVIDE_METHOD(tri))
-    return result
 
-def subdivide_tris_n(tris : list[Tri], n : int) -> list[Tri]:
+# Struct-of-arrays form of a list of triangles, used by the subdivision loop.
+# Vertices shared by several triangles are stored once in points.
+@dataclass
+class TriArray:
+    points: np.ndarray   # (V,2) float64
+    indices: np.ndarray  # (N,3) int32, indices of A, B, C in points
+    colors: np.ndarray   # (N,) uint8
+
+    def __len__(self) -> int:
+        return len(self.colors)
+
+    # Vertices A, B, C of all triangles as an (N,3,2) array
+    @property
+    def verts(self) -> np.ndarray:
+        return self.points[self.indices]
+
+# Subdivision rules, indexed by triangle color (0 = red, 1 = blue). Each rule
+# lists the edges split at 1/φ from their start, as (start, end) vertex slots,
+# and the children as (slots, color). Slots 0..2 are the parent's A, B, C and
+# slot 3+k is the k-th split point.
+SubdivisionRule = tuple[tuple[tuple[int, int], ...],
+                        tuple[tuple[tuple[int, int, int], int], ...]]
+
+SUBDIVIDE_METHOD_1 : tuple[SubdivisionRule, SubdivisionRule] = (
+    # Red: P = A -> B; (C, P, B) red, (P, C, A) blue
+    (((0, 1),), (((2, 3, 1), 0), ((3, 2, 0), 1))),
+    # Blue: Q = B -> A, R = B -> C; (R, C, A) blue, (Q, R, B) blue, (R, Q, A) red
+    (((1, 0), (1, 2)), (((4, 2, 0), 1), ((3, 4, 1), 1), ((4, 3, 0), 0))),
+)
+
+SUBDIVIDE_METHOD_2 : tuple[SubdivisionRule, SubdivisionRule] = (
+    # Red (sharp isosceles) (half kite): Q = A -> B, R = B -> C;
+    # (R, Q, B) blue, (Q, A, R) red, (C, A, R) red
+    (((0, 1), (1, 2)), (((4, 3, 1), 1), ((3, 0, 4), 0), ((2, 0, 4), 0))),
+    # Blue (fat isosceles) (half dart): P = C -> A; (B, P, A) blue, (P, C, B) red
+    (((2, 0),), (((1, 3, 0), 1), ((3, 2, 1), 0))),
+)
+
+# Writes A + (B - A) / φ into out, without temporaries
+def _split_into(A : np.ndarray, B : np.ndarray, out : np.ndarray):
+    np.subtract(B, A, out=out)
+    out *= INV_PHI
+    out += A
+
+# Applies the subdivision rules to all triangles at once. Each split edge is
+# keyed by its ordered (start, end) pair, since the split point sits at 1/φ
+# from the start; triangles sharing a split edge get the same new point.
+# Triangles are kept sorted by color (all reds, then all blues), so each color
+# is a contiguous slice processed without branches or gathers. Children are
+# written back in the same order: red children of reds and blues, then blue
+# children of reds and blues.
+def subdivide_tris_once(tris : TriArray,
+                        method : tuple[SubdivisionRule, SubdivisionRule] = SUBDIVIDE_METHOD_1) -> TriArray:
+    V = len(tris.points)
+    indices, colors = tris.indices, tris.colors
+    nr = int(np.count_nonzero(colors == 0))
+    if colors[:nr].any():
+        order = np.argsort(colors, kind="stable")
+        indices, colors = indices[order], colors[order]
+    parents = (indices[:nr], indices[nr:])
+
+    # Split all edges of both colors together, so that an edge shared by a red
+    # and a blue triangle also gets a single point
+    start = np.concatenate([tri[:, s].astype(np.int64)
+                            for tri, (splits, _) in zip(parents, method) for s, _ in splits])
+    end = np.concatenate([tri[:, e].astype(np.int64)
+                          for tri, (splits, _) in zip(parents, method) for _, e in splits])
+    edges, inverse = np.unique(start * V + end, return_inverse=True)
+    new_ids = (V + inverse).astype(np.int32)
+
+    points = np.empty((V + len(edges),) + tris.points.shape[1:])
+    points[:V] = tris.points
+    _split_into(tris.points[edges // V], tris.points[edges % V], points[V:])
+
+    # Columns for each slot: parent vertices, then split points, per color
+    slots = []
+    w = 0
+    for tri, (splits, _) in zip(parents, method):
+        slots.append([tri[:, 0], tri[:, 1], tri[:, 2]] +
+                     [new_ids[w + k*len(tri) : w + (k+1)*len(tri)] for k in range(len(splits))])
+        w += len(splits) * len(tri)
+
+    n_out = sum(len(tri) * len(children) for tri, (_, children) in zip(parents, method))
+    indices = np.empty((n_out, 3), dtype=np.int32)
+    colors = np.empty(n_out, dtype=np.uint8)
+    w = 0
+    for color in (0, 1):
+        w0 = w
+        for tri, cols, (_, children) in zip(parents, slots, method):
+            for child, child_color in children:
+                if child_color == color:
+                    out = indices[w:w + len(tri)]
+                    out[:, 0], out[:, 1], out[:, 2] = (cols[i] for i in child)
+                    w += len(tri)
+        colors[w0:w] = color
+    return TriArray(points, indices, colors)
+
+def _subdivide_tris_passes(tris : TriArray, n : int,
+                           method : tuple[SubdivisionRule, SubdivisionRule]) -> TriArray:
     for _ in range(n):
-        tris = subdivide_tris_once(tris)
+        tris = subdivide_tris_once(tris, method)
     return tris
 
 
-def starting_tris(center : QPoint2D, radius : QQuad) -> list[Tri]:
-    # Create wheel of red triangles around the origin
-    triangles : list[Tri] = []
-    for i in range(10):
-        b : QPoint2D = center + QPoint2D.of_angle((2*i - 1) * math.pi / 10).scale(radius)
-        c : QPoint2D = center + QPoint2D.of_angle((2*i + 1) * math.pi / 10).scale(radius)
-        if i % 2 == 0:
-            b, c = c, b # Make sure to mirror every second triangle
-        triangles.append(Tri((center, b, c), 0))
-    return triangles
-
-def color_to_rgb(color: int) -> tuple[float, float, float]:
-    if color == 0:
-        return (1.0, 0.35, 0.35) # red
-    else:
-        return (0.4, 0.4, 1.0) # blue
-
-def draw_tri(tri : Tri, model_stroke : float, cr : cairo.Context):
-    cr.move_to(tri.A().x.to_float(), tri.A().y.to_float())
-    cr.line_to(tri.B().x.to_float(), tri.B().y.to_float())
-    cr.line_to(tri.C().x.to_float(), tri.C().y.to_float())
-    cr.close_path()
-    print(f"drawing tri: {tri}")
-    cr.set_source_rgb(*color_to_rgb(tri.color))
-    # cr.fill()
-    # cr.fill_preserve()
-    # # tracciare il contorno (stroke)
-    # cr.set_source_rgb(0, 0, 0)  # nero
-    cr.set_line_width(model_stroke)
-    cr.fill()
+# n-fold subdivision of a single triangle, with points in barycentric
+# coordinates of its A, B, C. Points 0..2 are the corners; since splits only
+# mix the two ends of an edge, points on an edge have an exact 0 coefficient
+# for the opposite corner.
+@dataclass
+class SubdivisionTemplate:
+    tris: TriArray      # points (V,3), red children first
+    interior: np.ndarray  # (I,) ids of points strictly inside the triangle
+    # Ids of the points inside each edge (u, v) in (0,1), (0,2), (1,2),
+    # ordered from u to v
+    edges: list[tuple[int, int, np.ndarray]]
+    num_red: int
+
+_TEMPLATES : dict[tuple, SubdivisionTemplate] = {}
+
+def subdivision_template(method : tuple[SubdivisionRule, SubdivisionRule],
+                         n : int, color : int) -> SubdivisionTemplate:
+    key = (method, n, color)
+    if key not in _TEMPLATES:
+        tris = TriArray(np.eye(3), np.array([[0, 1, 2]], dtype=np.int32),
+                        np.array([color], dtype=np.uint8))
+        tris = _subdivide_tris_passes(tris, n, method)
+        zeros = np.count_nonzero(tris.points == 0, axis=1)
+        zeros[:3] = 3
+        edges = []
+        for u, v, w in ((0, 1, 2), (0, 2, 1), (1, 2, 0)):
+            ids = np.flatnonzero((zeros == 1) & (tris.points[:, w] == 0))
+            edges.append((u, v, ids[np.argsort(tris.points[ids, v], kind="stable")]))
+        _TEMPLATES[key] = SubdivisionTemplate(
+            tris, np.flatnonzero(zeros == 0), edges,
+            int(np.count_nonzero(tris.colors == 0)))
+    return _TEMPLATES[key]
+
+# Subdivides n times. Each parent triangle is replaced by a cached n-fold
+# subdivision of one triangle of its color, mapped onto it with a single
+# matmul, instead of running n passes over the whole set. Points inside a
+# shared parent edge are merged by their rank along the edge, so vertices stay
+# shared.
+# This assumes the parents form a consistent Robinson tiling, where both
+# triangles on a shared edge split it into the same points (true for the
+# starting wheel and anything subdivided from it). Then the result is the same
+# as n calls to subdivide_tris_once, up to rounding and vertex numbering. If
+# merged edge points sit at different positions along their edge, this falls
+# back to n passes.
+def subdivide_tris_n(tris : TriArray, n : int,
+                     method : tuple[SubdivisionRule, SubdivisionRule] = SUBDIVIDE_METHOD_1) -> TriArray:
+    if n == 0 or len(tris) == 0:
+        return tris
+    V = len(tris.points)
+    blocks = []
+    for color in (0, 1):
+        tri = tris.indices[tris.colors == color]
+        if len(tri):
+            blocks.append((tri, subdivision_template(method, n, color), tris.points[tri]))
+
+    # Parent edges, canonically oriented from the lower to the higher index
+    edge_keys = []
+    for tri, T, _ in blocks:
+        for u, v, _ in T.edges:
+            lo = np.minimum(tri[:, u], tri[:, v]).astype(np.int64)
+            hi = np.maximum(tri[:, u], tri[:, v]).astype(np.int64)
+            edge_keys.append(lo * V + hi)
+    _, edge_ids = np.unique(np.concatenate(edge_keys), return_inverse=True)
+
+    # Points inside edges, keyed by (edge, rank from the lower index), with
+    # their barycentric position along the edge from the lower index
+    K = 1 + max(len(ids) for _, T, _ in blocks for _, _, ids in T.edges)
+    point_keys, point_coords, point_params = [], [], []
+    w = 0
+    for tri, T, corners in blocks:
+        for u, v, ids in T.edges:
+            e = edge_ids[w:w + len(tri)]
+            w += len(tri)
+            forward = (tri[:, u] < tri[:, v])[:, None]
+            rank = np.arange(len(ids))
+            rank = np.where(forward, rank, len(ids) - 1 - rank)
+            point_keys.append(e[:, None] * K + rank)
+            point_coords.append(np.matmul(T.tris.points[ids], corners))
+            point_params.append(np.where(forward, T.tris.points[ids, v], T.tris.points[ids, u]))
+    point_keys = np.concatenate([k.ravel() for k in point_keys])
+    point_coords = np.concatenate([c.reshape(-1, 2) for c in point_coords])
+    point_params = np.concatenate([t.ravel() for t in point_params])
+    _, first, inverse = np.unique(point_keys, return_index=True, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    # Compared in barycentric terms, so the check does not depend on the size
+    # or position of the triangles
+    if not np.allclose(point_params, point_params[first][inverse], rtol=0, atol=1e-9):
+        return _subdivide_tris_passes(tris, n, method)
+    E = len(first)
+
+    num_interior = sum(len(tri) * len(T.interior) for tri, T, _ in blocks)
+    points = np.empty((V + E + num_interior, 2))
+    points[:V] = tris.points
+    points[V:V + E] = point_coords[first]
+
+    # Global id of every template point of every parent
+    global_ids = []
+    w_edge, w_interior = 0, V + E
+    for tri, T, corners in blocks:
+        ids = np.empty((len(tri), len(T.tris.points)), dtype=np.int32)
+        ids[:, :3] = tri
+        for _, _, e_ids in T.edges:
+            k = len(tri) * len(e_ids)
+            ids[:, e_ids] = (V + inverse[w_edge:w_edge + k]).reshape(len(tri), -1)
+            w_edge += k
+        k = len(tri) * len(T.interior)
+        ids[:, T.interior] = np.arange(w_interior, w_interior + k).reshape(len(tri), -1)
+        np.matmul(T.tris.points[T.interior], corners,
+                  out=points[w_interior:w_interior + k].reshape(len(tri), -1, 2))
+        w_interior += k
+        global_ids.append(ids)
+
+    # Red children first, then blue children, as subdivide_tris_once does
+    indices, colors = [], []
+    for color in (0, 1):
+        for ids, (_, T, _) in zip(global_ids, blocks):
+            sel = T.tris.indices[:T.num_red] if color == 0 else T.tris.indices[T.num_red:]
+            indices.append(np.take(ids, sel, axis=1).reshape(-1, 3))
+            colors.append(np.full(len(ids) * len(sel), color, dtype=np.uint8))
+    return TriArray(points, np.concatenate(indices), np.concatenate(colors))
+
+
+def starting_tris(center : tuple[float, float], radius : float) -> TriArray:
+    # Create wheel of red triangles around the origin. Point 0 is the center,
+    # points 1..10 the rim, at angles (2k - 1)π/10.
+    angles = (2 * np.arange(10) - 1) * math.pi / 10
+    points = np.empty((11, 2))
+    points[0] = center
+    points[1:, 0] = center[0] + np.cos(angles) * radius
+    points[1:, 1] = center[1] + np.sin(angles) * radius
+
+    # Triangle i is (center, rim i, rim i+1)
+    rim = np.arange(10)
+    indices = np.stack([np.zeros(10, dtype=np.int32), 1 + rim, 1 + (rim + 1) % 10],
+                       axis=1).astype(np.int32)
+    # Make sure to mirror every second triangle
+    indices[::2, 1:] = indices[::2, :0:-1]
+    return TriArray(points, indices, np.zeros(10, dtype=np.uint8))
+
+# Fill colors indexed by triangle color
+RGB = [
+    (1.0, 0.35, 0.35), # red
+    (0.4, 0.4, 1.0), # blue
+]
+
+# Fills all triangles of a color as a single path, then strokes all outlines
+# in one final pass
+def draw_tris(tris : TriArray, model_stroke : float, cr : cairo.Context):
+    for color, rgb in enumerate(RGB):
+        sel = tris.indices[tris.colors == color]
+        for (ax, ay), (bx, by), (cx, cy) in tris.points[sel].tolist():
+            cr.move_to(ax, ay)
+            cr.line_to(bx, by)
+            cr.line_to(cx, cy)
+            cr.close_path()
+        cr.set_source_rgb(*rgb)
+        cr.fill()
 
     # Note that this is careful, we only draw C -> A -> B, but no B -> C
+    for (ax, ay), (bx, by), (cx, cy) in tris.verts.tolist():
+        cr.move_to(cx, cy)
+        cr.line_to(ax, ay)
+        cr.line_to(bx, by)
+    cr.set_line_width(model_stroke)
     cr.set_line_join(cairo.LINE_JOIN_ROUND)
-    cr.move_to(tri.C().x.to_float(), tri.C().y.to_float())
-    cr.line_to(tri.A().x.to_float(), tri.A().y.to_float())
-    cr.line_to(tri.B().x.to_float(), tri.B().y.to_float())
     cr.set_source_rgb(0.2, 0.2, 0.2)
     cr.stroke()
 
 
-def draw_tris(tris : list[Tri], model_stroke : float, cr : cairo.Context):
-    for tri in tris:
-        draw_tri(tri, model_stroke, cr)
-
+def svg_color(rgb : tuple[float, float, float]) -> str:
+    return "#" + "".join(f"{round(c * 255):02x}" for c in rgb)
 
-def tiling_by_subdivision():
+# SVG path data for the given (N,3,2) vertices, as A -> B -> C closed
+# triangles, or with outline=True as the same C -> A -> B open polylines
+# that draw_tris strokes. Formatted in one go rather than per triangle.
+def svg_path_data(verts : np.ndarray, outline : bool = False) -> str:
+    if outline:
+        verts = verts[:, [2, 0, 1]]
+        template = "M%.3f %.3fL%.3f %.3fL%.3f %.3f"
+    else:
+        template = "M%.3f %.3fL%.3f %.3fL%.3f %.3fZ"
+    return (template * len(verts)) % tuple(verts.ravel().tolist())
+
+# Writes the tiling as an SVG with one filled path per color and one outline
+# path, with the same appearance as draw_tris. No rasterization happens, so
+# this stays cheap for deep subdivisions.
+def write_svg(tris : TriArray, model_stroke : float, scale : float,
+              width : int, height : int, filename : str):
+    with open(filename, "w") as fp:
+        fp.write(f'<svg xmlns="http://www.w3.org/2000/svg" '
+                 f'width="{width}" height="{height}">\n')
+        fp.write(f'<g transform="scale({scale})">\n')
+        for color, rgb in enumerate(RGB):
+            verts = tris.points[tris.indices[tris.colors == color]]
+            fp.write(f'<path fill="{svg_color(rgb)}" d="')
+            fp.write(svg_path_data(verts))
+            fp.write('"/>\n')
+        fp.write(f'<path fill="none" stroke="{svg_color((0.2, 0.2, 0.2))}" '
+                 f'stroke-width="{model_stroke}" stroke-linejoin="round" d="')
+        fp.write(svg_path_data(tris.verts, outline=True))
+        fp.write('"/>\n</g>\n</svg>\n')
+
+
+# Output goes through Cairo as a PNG, unless filename ends in .svg
+def tiling_by_subdivision(filename : str = "tiling.png"):
     # 2. Define "model coordinates" (logical coordinate system)
     model_width, model_height = 300, 300  # units in your drawing space
     model_stroke = 1
-    center = QPoint2D(QQuad(model_width // 2), QQuad(model_height // 2))
-    radius = QQuad(math.sqrt(model_width**2 + model_height**2) // 3)
+    center = (model_width // 2, model_height // 2)
+    radius = math.sqrt(model_width**2 + model_height**2) // 3
     tris = starting_tris(center, radius)
     tris = subdivide_tris_n(tris, 5)
+    logger.info("%d tris", len(tris))
 
     # Output size
     surface_width, surface_height = 800, 600
 
-    # 1. Create surface and context
-    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, surface_width, surface_height)
-    ctx = cairo.Context(surface)
-
     # 3. Compute scale to fit model into surface while preserving aspect ratio
     model2surface_x = surface_width / model_width
     model2surface_y = surface_height / model_height
     model2surface = min(model2surface_x, model2surface_y)  # uniform scaling
 
+    if filename.endswith(".svg"):
+        write_svg(tris, model_stroke, model2surface,
+                  surface_width, surface_height, filename)
+        return
+
+    # 1. Create surface and context
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, surface_width, surface_height)
+    ctx = cairo.Context(surface)
+
     # 4. Translate to center
     ctx.scale(model2surface, model2surface)
 
@@ -270,60 +551,13 @@ def tiling_by_subdivision():
     draw_tris(tris, model_stroke, ctx)
 
     # 5. Save
-    surface.write_to_png("tiling.png")
-
-
-@dataclass
-class Point2D:
-    x: float = 0
-    y: float = 0
-
-    @staticmethod
-    def zero() -> "QPoint2D":
-        return QPoint2D(0, 0)
-
-    def add(self, other: "QPoint2D") -> "QPoint2D":
-        return QPoint2D(self.x + other.x, self.y + other.y)
-
-    def neg(self) -> "QPoint2D":
-        return QPoint2D(-self.x, -self.y)
-
-    def sub(self, other: "QPoint2D") -> "QPoint2D":
-        return self.add(other.neg())
-
-    def scale(self, scalar: float) -> "QPoint2D":
-        return QPoint2D(self.x * scalar, self.y * scalar)
-
-    def __add__(self, other: "QPoint2D") -> "QPoint2D":
-        return self.add(other)
-
-    def __sub__(self, other: "QPoint2D") -> "QPoint2D":
-        return self.sub(other)
-
-    def __neg__(self) -> "QPoint2D":
-        return self.neg()
-
-    def __mul__(self, scalar: float) -> "QPoint2D":
-        return self.scale(scalar)
-
-    def __rmul__(self, scalar: float) -> "QPoint2D":
-        return self.scale(scalar)
-
-    def __truediv__(self, scalar: float) -> "QPoint2D":
-        return self.scale(scalar.reciprocal())
- 
-    @staticmethod
-    def of_angle(angle: float) -> "QPoint2D":
-        return Point2D(float(cos(angle)), float(sin(angle)))
-
-    def len(self) -> float:
-        return sqrt(self.x.to_float()**2 + self.y.to_float()**2)
+    surface.write_to_png(filename)
 
 
 # cos(36°) = (1 + sqrt(5)) / 4 | cos^2 + sin^2 = 1
 # cos(72°) = (sqrt(5) - 1) / 4
 class Rhomb:
-    verts : List[QPoint2D]
+    verts : list[QPoint2D]
     color : bool
 
     @property
@@ -342,7 +576,7 @@ class Rhomb:
     def d(self) -> QPoint2D:
         return self.verts[3]
 
-def substitute(r : Rhomb) -> List[Rhomb]:
+def substitute(r : Rhomb) -> list[Rhomb]:
     if r.color:
         pass
     else:
@@ -350,4 +584,5 @@ def substitute(r : Rhomb) -> List[Rhomb]:
 
 
 if __name__ == "__main__":
-    main()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    tiling_by_subdivision()